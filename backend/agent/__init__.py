@@ -1,5 +1,5 @@
 """Init file for agent package."""
 from .state import AgentState
-from .graph import agent_graph, run_agent, create_agent_graph
+from .graph import agent_graph, run_agent, arun_agent, create_agent_graph
 
-__all__ = ['AgentState', 'agent_graph', 'run_agent', 'create_agent_graph']
+__all__ = ['AgentState', 'agent_graph', 'run_agent', 'arun_agent', 'create_agent_graph']
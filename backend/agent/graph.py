@@ -4,49 +4,77 @@ LangGraph workflow for vehicle market price agent.
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from typing import Dict, List
+from langchain_core.runnables import RunnableConfig
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import hashlib
 import re
+import numpy as np
 
 from .state import AgentState
+from .semantic_cache import SemanticCache
 from tools import search_vehicle_listings, compare_vehicle_prices, vehicle_scraper
-from rag import retrieve_vehicle_knowledge, vehicle_retriever
-from config import config
+from rag import retrieve_vehicle_knowledge, vehicle_retriever, get_embedder
+# Aliased because LangGraph injects the run config into nodes by the parameter
+# name 'config' (see generate_response)
+from config import config as app_config
 
 
 # Initialize LLM
 llm = ChatOpenAI(
-    model=config.LLM_MODEL,
-    temperature=config.LLM_TEMPERATURE,
-    api_key=config.OPENAI_API_KEY
+    model=app_config.LLM_MODEL,
+    temperature=app_config.LLM_TEMPERATURE,
+    api_key=app_config.OPENAI_API_KEY
 )
 
+# Query extraction should be deterministic so its results can be cached
+extraction_llm = llm.bind(temperature=0)
 
-def classify_intent(state: AgentState) -> AgentState:
-    """Classify user's intent from their query."""
-    query = state['user_query'].lower()
-    
-    # Check for comparison keywords
-    comparison_keywords = ['compare', 'vs', 'versus', 'difference between', 'which is better']
-    if any(keyword in query for keyword in comparison_keywords):
-        state['intent'] = 'comparison'
-    
-    # Check for price check keywords
-    elif any(word in query for word in ['price', 'cost', 'how much']):
-        state['intent'] = 'price_check'
-    
-    # General information
-    else:
-        state['intent'] = 'general_info'
-    
-    return state
+# Caps in-flight LLM requests so concurrent agent runs stay under provider rate limits
+llm_semaphore = asyncio.Semaphore(app_config.MAX_LLM_CONCURRENCY)
 
 
-def extract_vehicle_query(user_query: str, intent: str) -> str:
-    """Extract clean vehicle query from conversational input using LLM."""
-    
-    extraction_prompt = f"""Extract ONLY the vehicle information from this query in a clean format.
+# Keyword matchers are compiled once so each query is scanned in a single pass
+_COMPARISON_RE = re.compile('|'.join(map(re.escape, [
+    'compare', 'vs', 'versus', 'difference between', 'which is better'
+])))
+_PRICE_RE = re.compile('|'.join(map(re.escape, ['price', 'cost', 'how much'])))
+_FILLER_WORDS_RE = re.compile(
+    r'\b(?:compare|price|of|the|between|in|sri|lanka|buy|need|want)\b',
+    re.IGNORECASE
+)
+
+# Queries already in "Brand Model YYYY" / "Brand Model YYYY-YYYY" form don't need the LLM
+_CLEAN_QUERY_RE = re.compile(
+    r'^([A-Za-z]+)((?:\s+[A-Za-z0-9]+){1,3})\s+((?:19|20)\d{2}(?:\s*-\s*(?:19|20)\d{2})?)$'
+)
+# Price-check phrasing around a vehicle query; stripped before the clean-query match
+_INTENT_WORDS_RE = re.compile(
+    r'\b(?:pric(?:e|es|ed|ing)|costs?|how\s+much(?:\s+(?:is|are|does|do))?'
+    r'|of|for|the|an?|in\s+sri\s+lanka)\b',
+    re.IGNORECASE
+)
+_CONVERSATIONAL_RE = re.compile(
+    r'\b(?:compare|buy|need|want|price|cost|how|what|which|vs|versus|with|and|from|to)\b',
+    re.IGNORECASE
+)
+_KNOWN_BRANDS = {
+    brand.lower(): brand for brand in [
+        'Toyota', 'Honda', 'Suzuki', 'Nissan', 'Mitsubishi', 'Mazda', 'Daihatsu',
+        'Subaru', 'Isuzu', 'Lexus', 'BMW', 'Mercedes', 'Benz', 'Audi', 'Hyundai',
+        'KIA', 'Volkswagen', 'Ford', 'Perodua', 'Micro', 'Tata'
+    ]
+}
+
+# LLM extraction results keyed by normalized query hash
+EXTRACT_CACHE_SIZE = 4096
+_extract_cache: "OrderedDict[str, str]" = OrderedDict()
 
-User query: "{user_query}"
+
+# Prompts are kept static and sent first so the provider's automatic prefix
+# cache can reuse them across requests. Per-request data always goes last.
+EXTRACTION_PROMPT = """Extract ONLY the vehicle information from the user's query in a clean format.
 
 Rules:
 1. Extract brand, model, and year/year range ONLY
@@ -63,28 +91,124 @@ Examples:
 - "Toyota Corolla 1995-2003" → "Toyota Corolla 1995-2003"
 - "Nissan Leaf from 2020 to 2022" → "Nissan Leaf 2020-2022"
 
-Extracted vehicle query:"""
+Reply with the extracted vehicle query only."""
+
+RESPONSE_SYSTEM_PROMPT = """You are a helpful vehicle market assistant for Sri Lanka. 
+You help users find vehicle prices, compare vehicles, and provide market insights.
+Be conversational, friendly, and informative. Use the provided data to give accurate information.
+When showing prices, format them nicely with commas (e.g., Rs 4,500,000).
+If comparing vehicles, highlight key differences and provide recommendations.
+
+Guidelines:
+- Base prices on the current market listings and knowledge base information you are given.
+- Do not invent listings, prices, or sellers that are not in the provided data.
+- If no listings were found, say so and fall back to the knowledge base price ranges.
+- Mention which websites the listings came from (Riyasewana, Ikman, Patpat) when relevant.
+- Keep answers concise and end with a short recommendation when the user is deciding between vehicles."""
+
+
+async def _ainvoke_llm(messages: List, model=None) -> AIMessage:
+    """Call the LLM (or a bound variant of it) without blocking the event loop."""
+    async with llm_semaphore:
+        return await (model or llm).ainvoke(messages)
+
+
+async def _astream_llm(messages: List, on_token: Callable[[str], Awaitable[None]]) -> str:
+    """Stream the LLM reply through on_token and return the full text."""
+    parts = []
+    async with llm_semaphore:
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                await on_token(chunk.content)
+    return "".join(parts)
+
+
+async def classify_intent(state: AgentState) -> AgentState:
+    """Classify user's intent from their query."""
+    query = state['user_query'].lower()
+    
+    # Check for comparison keywords
+    if _COMPARISON_RE.search(query):
+        state['intent'] = 'comparison'
+    
+    # Check for price check keywords
+    elif _PRICE_RE.search(query):
+        state['intent'] = 'price_check'
+    
+    # General information
+    else:
+        state['intent'] = 'general_info'
+    
+    return state
+
+
+def _match_clean_query(user_query: str) -> Optional[str]:
+    """
+    Return the query in canonical form if it is a clean vehicle query.
+    
+    Price-check wording such as "price of" or "how much is" is removed first,
+    so "Toyota Aqua 2018 price" matches. Only "Brand Model YYYY" and
+    "Brand Model YYYY-YYYY" shapes are accepted; anything else, including
+    queries without a 4-digit year, goes to the LLM.
+    """
+    query = _INTENT_WORDS_RE.sub(' ', user_query.strip().strip('?.!'))
+    query = ' '.join(query.split())
+    brand, _, rest = query.partition(' ')
+    brand = _KNOWN_BRANDS.get(brand.lower())
+    if brand is None or not rest or _CONVERSATIONAL_RE.search(query):
+        return None
+    
+    match = _CLEAN_QUERY_RE.match(query)
+    if not match:
+        return None
+    
+    years = re.sub(r'\s+', '', match.group(3))
+    return f"{brand}{match.group(2)} {years}"
+
+
+async def extract_vehicle_query(user_query: str, intent: str) -> str:
+    """Extract clean vehicle query from conversational input using LLM."""
+    
+    # Fast path: skip the LLM round-trip for queries that are already clean
+    if intent != 'comparison':
+        clean_query = _match_clean_query(user_query)
+        if clean_query:
+            return clean_query
+    
+    cache_key = hashlib.blake2b(user_query.lower().strip().encode(), digest_size=16).hexdigest()
+    if cache_key in _extract_cache:
+        _extract_cache.move_to_end(cache_key)
+        return _extract_cache[cache_key]
     
     try:
-        messages = [HumanMessage(content=extraction_prompt)]
-        response = llm.invoke(messages)
+        messages = [
+            SystemMessage(content=EXTRACTION_PROMPT),
+            HumanMessage(content=f'User query: "{user_query}"\n\nExtracted vehicle query:')
+        ]
+        response = await _ainvoke_llm(messages, model=extraction_llm)
         extracted = response.content.strip()
         # Remove quotes if present
         extracted = extracted.strip('"\'')
-        return extracted if extracted else user_query
+        if not extracted:
+            return user_query
+        
+        _extract_cache[cache_key] = extracted
+        if len(_extract_cache) > EXTRACT_CACHE_SIZE:
+            _extract_cache.popitem(last=False)
+        return extracted
     except Exception as e:
         print(f"Error extracting vehicle query: {e}")
         return user_query
 
 
-
-def scrape_vehicles(state: AgentState) -> AgentState:
+async def scrape_vehicles(state: AgentState) -> AgentState:
     """Scrape vehicle data from websites."""
     user_query = state['user_query']
     intent = state['intent']
     
     # Extract clean vehicle query from conversational input
-    clean_query = extract_vehicle_query(user_query, intent)
+    clean_query = await extract_vehicle_query(user_query, intent)
     print(f"Original query: {user_query}")
     print(f"Extracted query: {clean_query}")
     
@@ -97,82 +221,101 @@ def scrape_vehicles(state: AgentState) -> AgentState:
             models = extract_vehicle_models(clean_query)
         
         if len(models) >= 2:
-            comparison = vehicle_scraper.compare_vehicles(models)
+            comparison = await vehicle_scraper.acompare_vehicles(models)
             state['comparison_data'] = comparison
             state['scraped_data'] = []
             for model_vehicles in comparison['vehicles'].values():
-                state['scraped_data'].extend(model_vehicles[:3])  # Top 3 from each
+                # Top 3 from each; acompare_vehicles has already deduplicated them
+                state['scraped_data'].extend(model_vehicles[:3])
         else:
             # Fallback to single search
-            vehicles = vehicle_scraper.search_all(clean_query)
-            state['scraped_data'] = vehicles[:10]
+            vehicles = await vehicle_scraper.asearch_all(clean_query)
+            state['scraped_data'] = vehicles[:app_config.SCRAPER_MAX_RESULTS]
     
     else:
         # Single vehicle search
-        vehicles = vehicle_scraper.search_all(clean_query)
-        state['scraped_data'] = vehicles[:10]
+        # asearch_all returns listings already deduplicated and sorted
+        vehicles = await vehicle_scraper.asearch_all(clean_query)
+        state['scraped_data'] = vehicles[:app_config.SCRAPER_MAX_RESULTS]
     
     return state
 
 
-def retrieve_knowledge(state: AgentState) -> AgentState:
+async def retrieve_knowledge(state: AgentState) -> AgentState:
     """Retrieve relevant knowledge from RAG pipeline."""
     query = state['user_query']
     
-    # Retrieve relevant documents
-    docs = vehicle_retriever.retrieve(query, top_k=3)
-    context = vehicle_retriever.format_context(docs)
-    
-    state['retrieved_context'] = context
+    # Retrieve relevant documents, formatted as prompt context
+    state['retrieved_context'] = await asyncio.to_thread(
+        vehicle_retriever.retrieve_and_format_cached, query, 3
+    )
     
     return state
 
 
-def generate_response(state: AgentState) -> AgentState:
-    """Generate conversational response using LLM."""
+async def gather_context(state: AgentState) -> Dict:
+    """Scrape listings and retrieve knowledge concurrently."""
+    # The two lookups are independent, so retrieval runs while the scrapers wait on the network
+    scraped, retrieved = await asyncio.gather(
+        scrape_vehicles(dict(state)),
+        retrieve_knowledge(dict(state))
+    )
     
-    # Build context for LLM
-    system_prompt = """You are a helpful vehicle market assistant for Sri Lanka. 
-You help users find vehicle prices, compare vehicles, and provide market insights.
-Be conversational, friendly, and informative. Use the provided data to give accurate information.
-When showing prices, format them nicely with commas (e.g., Rs 4,500,000).
-If comparing vehicles, highlight key differences and provide recommendations."""
+    return {
+        'scraped_data': scraped['scraped_data'],
+        'comparison_data': scraped.get('comparison_data', {}),
+        'retrieved_context': retrieved['retrieved_context']
+    }
+
+
+async def generate_response(state: AgentState, config: RunnableConfig = None) -> AgentState:
+    """Generate conversational response using LLM, streaming tokens if requested."""
     
     # Prepare scraped data summary
     scraped_summary = ""
     if state.get('scraped_data'):
-        scraped_summary = "\n\nCurrent Market Listings:\n"
-        for i, vehicle in enumerate(state['scraped_data'][:5], 1):
-            scraped_summary += f"{i}. {vehicle['title']} - Rs {vehicle['price']:,.0f} ({vehicle['source']})\n"
+        parts = ["\n\nCurrent Market Listings:\n"]
+        parts.extend(
+            f"{i}. {vehicle['title']} - Rs {vehicle['price']:,.0f} ({vehicle['source']})\n"
+            for i, vehicle in enumerate(state['scraped_data'][:5], 1)
+        )
+        scraped_summary = "".join(parts)
     
     # Prepare comparison summary
     comparison_summary = ""
     if state.get('comparison_data') and state['comparison_data'].get('summary'):
-        comparison_summary = "\n\nPrice Comparison Summary:\n"
-        for model, summary in state['comparison_data']['summary'].items():
-            comparison_summary += f"\n{model}:\n"
-            comparison_summary += f"  - Average: Rs {summary['avg_price']:,.0f}\n"
-            comparison_summary += f"  - Range: Rs {summary['min_price']:,.0f} - Rs {summary['max_price']:,.0f}\n"
-            comparison_summary += f"  - Listings: {summary['count']}\n"
+        parts = ["\n\nPrice Comparison Summary:\n"]
+        parts.extend(
+            f"\n{model}:\n"
+            f"  - Average: Rs {summary['avg_price']:,.0f}\n"
+            f"  - Range: Rs {summary['min_price']:,.0f} - Rs {summary['max_price']:,.0f}\n"
+            f"  - Listings: {summary['count']}\n"
+            for model, summary in state['comparison_data']['summary'].items()
+        )
+        comparison_summary = "".join(parts)
     
     # Retrieved context
     context = state.get('retrieved_context', '')
     
-    # Build messages
+    # Build messages (static system prompt first, user query last)
     messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"""User Query: {state['user_query']}
-
-{context}
+        SystemMessage(content=RESPONSE_SYSTEM_PROMPT),
+        HumanMessage(content=f"""{context}
 {scraped_summary}
 {comparison_summary}
 
+User Query: {state['user_query']}
+
 Please provide a helpful response to the user's query based on the above information.""")
     ]
     
     # Generate response
-    response = llm.invoke(messages)
-    state['final_response'] = response.content
+    on_token = (config or {}).get('configurable', {}).get('on_token')
+    if on_token:
+        state['final_response'] = await _astream_llm(messages, on_token)
+    else:
+        response = await _ainvoke_llm(messages)
+        state['final_response'] = response.content
     
     # Add to conversation messages
     state['messages'].append({
@@ -205,13 +348,10 @@ def extract_vehicle_models(query: str) -> List[str]:
     # Clean up models
     models = [m.strip() for m in models]
     
-    # Remove common words
-    remove_words = ['compare', 'price', 'of', 'the', 'between', 'in', 'sri', 'lanka', 'buy', 'need', 'want']
+    # Remove common words (whole words only, so e.g. "in" is not cut out of "Pathfinder")
     cleaned_models = []
     for model in models:
-        for word in remove_words:
-            model = model.replace(word, '')
-        model = model.strip()
+        model = ' '.join(_FILLER_WORDS_RE.sub(' ', model).split())
         if model:
             cleaned_models.append(model)
     
@@ -234,7 +374,7 @@ def create_agent_graph():
     
     # Add nodes
     workflow.add_node("classify_intent", classify_intent)
-    workflow.add_node("scrape_vehicles", scrape_vehicles)
+    workflow.add_node("gather_context", gather_context)
     workflow.add_node("retrieve_knowledge", retrieve_knowledge)
     workflow.add_node("generate_response", generate_response)
     
@@ -246,12 +386,12 @@ def create_agent_graph():
         "classify_intent",
         should_scrape,
         {
-            "scrape": "scrape_vehicles",
+            "scrape": "gather_context",
             "skip_scrape": "retrieve_knowledge"
         }
     )
     
-    workflow.add_edge("scrape_vehicles", "retrieve_knowledge")
+    workflow.add_edge("gather_context", "generate_response")
     workflow.add_edge("retrieve_knowledge", "generate_response")
     workflow.add_edge("generate_response", END)
     
@@ -265,19 +405,47 @@ def create_agent_graph():
 agent_graph = create_agent_graph()
 
 
-def run_agent(user_query: str, conversation_history: List[Dict] = None) -> Dict:
+def _embed_query(text: str) -> np.ndarray:
+    """Embed a query with the shared sentence-transformer."""
+    return get_embedder().encode(
+        text, normalize_embeddings=True, show_progress_bar=False
+    )
+
+
+# Cache of agent results for semantically identical queries
+semantic_cache = SemanticCache(
+    _embed_query,
+    max_size=app_config.SEMANTIC_CACHE_SIZE,
+    threshold=app_config.SEMANTIC_CACHE_THRESHOLD,
+    ttl=app_config.SEMANTIC_CACHE_TTL
+)
+
+
+async def arun_agent(
+    user_query: str,
+    conversation_history: List[Dict] = None,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Dict:
     """
     Run the agent with a user query.
     
     Args:
         user_query: User's question
         conversation_history: Previous messages
+        on_token: Optional coroutine called with each response token as it streams
         
     Returns:
         Agent response with data
     """
+    # Embedding the query is CPU-bound model inference, keep it off the loop
+    cached, embedding = await asyncio.to_thread(semantic_cache.lookup, user_query)
+    if cached is not None:
+        if on_token:
+            await on_token(cached['response'])
+        return dict(cached)
+    
     initial_state = {
-        'messages': conversation_history or [],
+        'messages': list(conversation_history or []),
         'user_query': user_query,
         'intent': '',
         'scraped_data': [],
@@ -285,13 +453,32 @@ def run_agent(user_query: str, conversation_history: List[Dict] = None) -> Dict:
         'final_response': '',
         'comparison_data': {}
     }
+    run_config = {'configurable': {'on_token': on_token}}
+    
+    # General questions are just retrieval + generation, so call those
+    # directly and skip graph dispatch; everything else runs the graph
+    state = await classify_intent(initial_state)
+    if state['intent'] == 'general_info':
+        state = await retrieve_knowledge(state)
+        result = await generate_response(state, run_config)
+    else:
+        result = await agent_graph.ainvoke(initial_state, config=run_config)
     
-    # Run the graph
-    result = agent_graph.invoke(initial_state)
-    
-    return {
+    response = {
         'response': result['final_response'],
         'vehicles': result.get('scraped_data', [])[:5],
         'comparison': result.get('comparison_data', {}),
         'intent': result['intent']
     }
+    
+    # Don't cache empty scrapes, they are usually transient site failures
+    if response['vehicles'] or response['intent'] == 'general_info':
+        await asyncio.to_thread(semantic_cache.store, user_query, response, embedding)
+    
+    return response
+
+
+def run_agent(user_query: str, conversation_history: List[Dict] = None) -> Dict:
+    """Synchronous wrapper around arun_agent for scripts and tests."""
+    # The scraper's async session belongs to this temporary loop, so close it before the loop exits
+    return asyncio.run(vehicle_scraper._run_and_close(arun_agent(user_query, conversation_history)))
@@ -0,0 +1,138 @@
+"""
+Semantic cache for agent responses.
+
+Queries that are worded differently but mean the same thing (e.g. "price of
+Honda Fit 2018" and "Honda Fit 2018 price") embed to nearly identical vectors,
+so the previous agent result can be served without re-running the graph.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import re
+import threading
+import time
+
+import numpy as np
+
+
+_NUMBER_RE = re.compile(r'\d+')
+
+
+class SemanticCache:
+    """Bounded LRU of agent results looked up by query embedding similarity."""
+
+    def __init__(self, embed_fn: Callable[[str], np.ndarray], max_size: int = 1000,
+                 threshold: float = 0.95, ttl: float = 900):
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+
+        # Embeddings live in one preallocated float32 matrix so a lookup is a
+        # single matmul; row i belongs to _slots[i] = (key, result, timestamp,
+        # numbers in query). Allocated on first store, once the dim is known.
+        self._emb_matrix: Optional[np.ndarray] = None
+        self._slots: List[Optional[Tuple]] = []
+        self._n = 0
+        self._free: List[int] = []
+        # normalized query -> slot index, in LRU order
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    def _evict(self, key: str):
+        """Free the slot of a cached key. Caller holds the lock."""
+        slot = self._index.pop(key)
+        self._slots[slot] = None
+        # A zero row can never reach the threshold
+        self._emb_matrix[slot] = 0
+        self._free.append(slot)
+
+    def lookup(self, query: str) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+        """
+        Look up a cached result for a query.
+
+        Args:
+            query: User query
+
+        Returns:
+            Tuple of (cached result or None, query embedding). The embedding is
+            None on an exact-match hit, since none had to be computed.
+        """
+        key = self._normalize(query)
+        now = time.time()
+
+        with self._lock:
+            slot = self._index.get(key)
+            if slot is not None and now - self._slots[slot][2] <= self.ttl:
+                self._index.move_to_end(key)
+                return self._slots[slot][1], None
+
+        embedding = np.asarray(self.embed_fn(key), dtype=np.float32)
+        # Years and model numbers embed very closely ("Fit 2017" vs "Fit 2018"),
+        # so a semantic hit also has to agree on every number in the query
+        numbers = frozenset(_NUMBER_RE.findall(key))
+
+        with self._lock:
+            if not self._index:
+                return None, embedding
+
+            sims = self._emb_matrix[:self._n] @ embedding
+            candidates = np.flatnonzero(sims >= self.threshold)
+
+            for slot in candidates[np.argsort(-sims[candidates])]:
+                cached_key, result, ts, cached_numbers = self._slots[slot]
+                if now - ts > self.ttl:
+                    self._evict(cached_key)
+                    continue
+                if cached_numbers == numbers:
+                    self._index.move_to_end(cached_key)
+                    return result, embedding
+
+        return None, embedding
+
+    def store(self, query: str, result: Dict, embedding: Optional[np.ndarray] = None):
+        """
+        Store an agent result for a query.
+
+        Args:
+            query: User query
+            result: Agent result to cache
+            embedding: Query embedding from lookup(), computed if not given
+        """
+        key = self._normalize(query)
+        if embedding is None:
+            embedding = self.embed_fn(key)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        numbers = frozenset(_NUMBER_RE.findall(key))
+
+        with self._lock:
+            if self._emb_matrix is None:
+                self._emb_matrix = np.zeros((self.max_size, embedding.shape[0]), dtype=np.float32)
+                self._slots = [None] * self.max_size
+
+            if key in self._index:
+                self._evict(key)
+            elif len(self._index) >= self.max_size:
+                self._evict(next(iter(self._index)))
+
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = self._n
+                self._n += 1
+
+            self._emb_matrix[slot] = embedding
+            self._slots[slot] = (key, result, time.time(), numbers)
+            self._index[key] = slot
+
+    def clear(self):
+        """Drop all cached results."""
+        with self._lock:
+            self._emb_matrix = None
+            self._slots = []
+            self._n = 0
+            self._free = []
+            self._index.clear()
@@ -17,18 +17,41 @@ class Config:
     # LLM Configuration
     LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
     LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+    MAX_LLM_CONCURRENCY = int(os.getenv("MAX_LLM_CONCURRENCY", "8"))
     
     # Scraper Configuration
     SCRAPER_TIMEOUT = int(os.getenv("SCRAPER_TIMEOUT", "30"))
     SCRAPER_MAX_RESULTS = int(os.getenv("SCRAPER_MAX_RESULTS", "10"))
     SCRAPER_RATE_LIMIT = float(os.getenv("SCRAPER_RATE_LIMIT", "2.0"))  # seconds between requests
+    SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "20"))  # concurrent connections per async session
     
     # Vector Store Configuration
     VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "./data/chroma")
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")  # 'onnx' or 'torch'
+    EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+    EMBEDDING_ONNX_GPU_FILE = os.getenv("EMBEDDING_ONNX_GPU_FILE", "onnx/model_O4.onnx")  # fp16, CUDA only
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(VECTOR_STORE_PATH), "models"))
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "1000"))  # listings per bulk-index chunk
     
     # RAG Configuration
     RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+    RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "1024"))
+    RAG_CACHE_TTL = int(os.getenv("RAG_CACHE_TTL", "300"))  # seconds, Redis only
+    RAG_CACHE = os.getenv("RAG_CACHE", "false").lower() == "true"  # in-memory vector search instead of Chroma queries
+    
+    # Redis Configuration (optional, enables caches shared across workers)
+    REDIS_URL = os.getenv("REDIS_URL", "")
+    
+    # Chat History Configuration
+    CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "20"))
+    CHAT_HISTORY_TTL = int(os.getenv("CHAT_HISTORY_TTL", "3600"))  # seconds, Redis only
+    
+    # Semantic Cache Configuration
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "900"))  # seconds
     
     # CORS Configuration
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:3000").split(",")
@@ -3,14 +3,17 @@ FastAPI backend server for vehicle market price agent.
 """
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import json
+import orjson
 import asyncio
+import redis.asyncio as aioredis
 
 from config import config
-from agent import run_agent
+from agent import arun_agent
 from rag import vehicle_indexer
+from tools import vehicle_scraper
 
 
 # Initialize FastAPI app
@@ -52,28 +55,45 @@ class HealthResponse(BaseModel):
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # Histories live in Redis when configured so every worker sees them;
+        # the in-process dict is the single-worker fallback
+        self.redis = aioredis.Redis.from_url(config.REDIS_URL, decode_responses=True) if config.REDIS_URL else None
         self.conversation_histories: Dict[str, List[Dict]] = {}
+        # Keep the last N turns (user + assistant message each)
+        self.max_history_messages = config.CHAT_HISTORY_MAX_TURNS * 2
     
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
         self.active_connections.append(websocket)
-        if client_id not in self.conversation_histories:
-            self.conversation_histories[client_id] = []
     
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
     
     async def send_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
+        # Text frames so the browser client can keep using JSON.parse
+        await websocket.send_text(orjson.dumps(message).decode())
     
-    def get_history(self, client_id: str) -> List[Dict]:
-        return self.conversation_histories.get(client_id, [])
+    async def get_history(self, client_id: str) -> List[Dict]:
+        if self.redis is None:
+            return list(self.conversation_histories.get(client_id, []))
+        
+        messages = await self.redis.lrange(f"chat:hist:{client_id}", 0, -1)
+        return [orjson.loads(message) for message in messages]
     
-    def add_to_history(self, client_id: str, message: Dict):
-        if client_id not in self.conversation_histories:
-            self.conversation_histories[client_id] = []
-        self.conversation_histories[client_id].append(message)
+    async def add_to_history(self, client_id: str, *messages: Dict):
+        if self.redis is None:
+            history = self.conversation_histories.setdefault(client_id, [])
+            history.extend(messages)
+            del history[:-self.max_history_messages]
+            return
+        
+        key = f"chat:hist:{client_id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *(orjson.dumps(message) for message in messages))
+            pipe.ltrim(key, -self.max_history_messages, -1)
+            pipe.expire(key, config.CHAT_HISTORY_TTL)
+            await pipe.execute()
 
 
 manager = ConnectionManager()
@@ -103,6 +123,12 @@ async def startup_event():
     print("API ready!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close long-lived scraper connections."""
+    await vehicle_scraper.aclose()
+
+
 # Health check endpoint
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -126,7 +152,7 @@ async def query_agent(request: QueryRequest):
         Agent response with vehicle data
     """
     try:
-        result = run_agent(request.query, request.conversation_history)
+        result = await arun_agent(request.query, request.conversation_history)
         
         return QueryResponse(
             response=result['response'],
@@ -139,6 +165,41 @@ async def query_agent(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/query/stream")
+async def query_agent_stream(request: QueryRequest):
+    """
+    Query the agent and stream the response as Server-Sent Events.
+    
+    Emits "token" events with response deltas, then a final "done" event
+    with the full response and vehicle data (or an "error" event).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def run():
+        try:
+            result = await arun_agent(
+                request.query,
+                request.conversation_history,
+                on_token=lambda token: queue.put({"type": "token", "delta": token})
+            )
+            await queue.put({"type": "done", **result})
+        except Exception as e:
+            await queue.put({"type": "error", "message": str(e)})
+        finally:
+            await queue.put(None)
+    
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while (event := await queue.get()) is not None:
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        finally:
+            # Stop the agent if the client went away mid-stream
+            task.cancel()
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 # WebSocket endpoint for real-time chat
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
@@ -161,7 +222,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             
             user_query = message_data.get('message', '')
             
@@ -175,25 +236,31 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             }, websocket)
             
             # Get conversation history
-            history = manager.get_history(client_id)
+            history = await manager.get_history(client_id)
             
-            # Run agent
+            # Run agent, streaming response tokens as they are generated
             try:
-                result = run_agent(user_query, history)
+                result = await arun_agent(
+                    user_query,
+                    history,
+                    on_token=lambda token: manager.send_message({
+                        "type": "token",
+                        "delta": token
+                    }, websocket)
+                )
                 
                 # Update conversation history
-                manager.add_to_history(client_id, {
+                await manager.add_to_history(client_id, {
                     'role': 'user',
                     'content': user_query
-                })
-                manager.add_to_history(client_id, {
+                }, {
                     'role': 'assistant',
                     'content': result['response']
                 })
                 
-                # Send response
+                # Send the complete response with vehicle data
                 await manager.send_message({
-                    "type": "response",
+                    "type": "done",
                     "message": result['response'],
                     "vehicles": result['vehicles'],
                     "comparison": result['comparison'],
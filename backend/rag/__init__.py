@@ -1,10 +1,12 @@
 """Init file for RAG package."""
+from .embedder import get_embedder
 from .vector_store import get_vector_store, VectorStore
 from .retriever import vehicle_retriever, retrieve_vehicle_knowledge, VehicleRetriever
 from .indexer import vehicle_indexer, VehicleIndexer
 
 __all__ = [
     'get_vector_store',
+    'get_embedder',
     'VectorStore',
     'vehicle_retriever',
     'retrieve_vehicle_knowledge',
@@ -0,0 +1,69 @@
+"""
+Shared sentence-transformers embedding model for the RAG pipeline and agent.
+"""
+from functools import lru_cache
+from sentence_transformers import SentenceTransformer
+from config import config
+import os
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> SentenceTransformer:
+    """
+    Get the process-wide embedding model, loading it on first use.
+    
+    Every VectorStore and the agent's semantic cache share these weights, so
+    the model (and its ONNX artifact) is only loaded once per process.
+    """
+    return _load_embedder()
+
+
+def _onnx_gpu_available() -> bool:
+    """Check for a usable CUDA device and an ONNX Runtime build with the CUDA provider."""
+    # get_available_providers() only lists what the build was compiled with,
+    # so onnxruntime-gpu on a CPU-only host still reports CUDA
+    import torch
+    if not torch.cuda.is_available():
+        return False
+    try:
+        import onnxruntime
+        return 'CUDAExecutionProvider' in onnxruntime.get_available_providers()
+    except ImportError:
+        return False
+
+
+def _load_embedder() -> SentenceTransformer:
+    """Load the embedding model, preferring the INT8-quantized ONNX build."""
+    # Keep downloaded/exported model files next to the vector store so restarts skip them
+    os.makedirs(config.EMBEDDING_CACHE_PATH, exist_ok=True)
+    
+    if config.EMBEDDING_BACKEND == 'onnx':
+        if _onnx_gpu_available():
+            file_name, provider = config.EMBEDDING_ONNX_GPU_FILE, 'CUDAExecutionProvider'
+        else:
+            file_name, provider = config.EMBEDDING_ONNX_FILE, 'CPUExecutionProvider'
+        try:
+            return SentenceTransformer(
+                config.EMBEDDING_MODEL,
+                backend='onnx',
+                cache_folder=config.EMBEDDING_CACHE_PATH,
+                model_kwargs={
+                    'file_name': file_name,
+                    'provider': provider
+                }
+            )
+        except Exception as e:
+            print(f"Could not load ONNX embedding model, falling back to PyTorch: {str(e)}")
+    
+    import torch
+    if torch.cuda.is_available():
+        # Half precision halves weight/activation bandwidth; bf16 where the GPU supports it
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return SentenceTransformer(
+            config.EMBEDDING_MODEL,
+            device='cuda',
+            cache_folder=config.EMBEDDING_CACHE_PATH,
+            model_kwargs={'torch_dtype': dtype}
+        )
+    
+    return SentenceTransformer(config.EMBEDDING_MODEL, cache_folder=config.EMBEDDING_CACHE_PATH)
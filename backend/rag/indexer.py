@@ -1,8 +1,11 @@
 """
 Document indexer for populating the vector store with vehicle knowledge.
 """
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
+from itertools import islice
 from .vector_store import get_vector_store
+from .retriever import vehicle_retriever
+from config import config
 import uuid
 from datetime import datetime
 
@@ -23,9 +26,51 @@ class VehicleIndexer:
         if not vehicles:
             return
         
+        documents, metadatas, ids = self._build_vehicle_documents(vehicles)
+        
+        # Add to vector store
+        self.vector_store.add_documents(documents, metadatas, ids)
+        vehicle_retriever.invalidate_cache()
+    
+    def index_vehicle_data_batch(self, vehicles: Iterable[Dict], batch_size: int = None) -> int:
+        """
+        Bulk-index a large crawl of vehicle listings (e.g. nightly crawler output).
+        
+        Listings are consumed lazily in chunks, so the whole crawl is never held
+        in memory as documents at once, and the retrieval cache is invalidated
+        once at the end rather than per chunk.
+        
+        Args:
+            vehicles: Iterable of vehicle dictionaries from scrapers
+            batch_size: Listings per chunk (default: config.INDEX_BATCH_SIZE)
+            
+        Returns:
+            Number of listings indexed
+        """
+        batch_size = batch_size or config.INDEX_BATCH_SIZE
+        vehicles = iter(vehicles)
+        total = 0
+        
+        while True:
+            chunk = list(islice(vehicles, batch_size))
+            if not chunk:
+                break
+            
+            documents, metadatas, ids = self._build_vehicle_documents(chunk)
+            self.vector_store.add_documents(documents, metadatas, ids)
+            total += len(chunk)
+        
+        if total:
+            vehicle_retriever.invalidate_cache()
+        
+        return total
+    
+    def _build_vehicle_documents(self, vehicles: List[Dict]) -> Tuple[List[str], List[Dict], List[str]]:
+        """Build document texts, metadata and IDs for vehicle listings."""
         documents = []
         metadatas = []
         ids = []
+        indexed_date = datetime.now().isoformat()
         
         for vehicle in vehicles:
             # Create document text
@@ -40,7 +85,7 @@ class VehicleIndexer:
                 'year': str(vehicle.get('year', '')),
                 'price': str(vehicle.get('price', 0)),
                 'source': vehicle.get('source', ''),
-                'indexed_date': datetime.now().isoformat()
+                'indexed_date': indexed_date
             }
             metadatas.append(metadata)
             
@@ -48,8 +93,7 @@ class VehicleIndexer:
             doc_id = str(uuid.uuid4())
             ids.append(doc_id)
         
-        # Add to vector store
-        self.vector_store.add_documents(documents, metadatas, ids)
+        return documents, metadatas, ids
     
     def _create_document_text(self, vehicle: Dict) -> str:
         """Create searchable document text from vehicle data."""
@@ -80,6 +124,7 @@ class VehicleIndexer:
         ids = [str(uuid.uuid4()) for _ in insights]
         
         self.vector_store.add_documents(documents, metadatas, ids)
+        vehicle_retriever.invalidate_cache()
     
     def seed_knowledge_base(self):
         """Seed the knowledge base with initial vehicle market knowledge."""
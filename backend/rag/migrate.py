@@ -0,0 +1,86 @@
+"""
+One-shot migration of the knowledge collection to the current HNSW settings.
+
+HNSW parameters are fixed when a Chroma collection is created, so a change to
+COLLECTION_METADATA needs the collection rebuilt. Run once, with the API
+stopped so no worker reads or writes the collection mid-swap:
+
+    python -m rag.migrate
+"""
+from .vector_store import VectorStore, get_vector_store, hnsw_outdated, COLLECTION_NAME, COLLECTION_METADATA
+import numpy as np
+
+
+# The rebuilt collection is staged under this name and only swapped in once
+# every document has been copied, so a crash mid-copy leaves the original intact
+STAGING_COLLECTION_NAME = f"{COLLECTION_NAME}_migrating"
+
+# Documents copied per page, bounding memory on large collections
+MIGRATION_PAGE_SIZE = 5000
+
+
+def migrate_collection() -> int:
+    """
+    Rebuild the knowledge collection with COLLECTION_METADATA if it is outdated.
+    
+    Returns:
+        Number of documents migrated (0 if already up to date)
+    """
+    store = get_vector_store()
+    
+    try:
+        staged = store.client.get_collection(STAGING_COLLECTION_NAME)
+    except Exception:
+        staged = None
+    
+    if staged is not None:
+        if store.collection.count() == 0:
+            # A previous run finished copying but stopped after dropping the original
+            print(f"Resuming interrupted migration of '{COLLECTION_NAME}'...")
+            _swap_in(store, staged)
+            return staged.count()
+        # A previous run stopped mid-copy; the original is intact, so start over
+        store.client.delete_collection(STAGING_COLLECTION_NAME)
+    
+    if not hnsw_outdated(store.collection):
+        print(f"Collection '{COLLECTION_NAME}' already uses the current HNSW settings")
+        return 0
+    
+    print(f"Migrating collection '{COLLECTION_NAME}' to updated HNSW settings...")
+    staged = store.client.create_collection(name=STAGING_COLLECTION_NAME, metadata=COLLECTION_METADATA)
+    offset = 0
+    while True:
+        page = store.collection.get(
+            include=["embeddings", "metadatas", "documents"],
+            limit=MIGRATION_PAGE_SIZE,
+            offset=offset
+        )
+        if not page['ids']:
+            break
+        # Inner product only equals cosine for unit vectors, and documents
+        # indexed by older versions were stored unnormalized
+        embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        staged.add(
+            ids=page['ids'],
+            embeddings=embeddings,
+            documents=page['documents'],
+            metadatas=page['metadatas']
+        )
+        offset += len(page['ids'])
+    
+    _swap_in(store, staged)
+    print(f"Migrated {offset} documents")
+    return offset
+
+
+def _swap_in(store: VectorStore, staged):
+    """Replace the live collection with the fully copied staging collection."""
+    store.client.delete_collection(COLLECTION_NAME)
+    staged.modify(name=COLLECTION_NAME)
+    store.collection = store.client.get_collection(COLLECTION_NAME)
+    store._clear_cache()
+
+
+if __name__ == "__main__":
+    migrate_collection()
@@ -1,9 +1,13 @@
 """
 RAG retriever for querying vehicle knowledge base.
 """
-from typing import List, Dict
+from typing import List, Dict, Optional
+from functools import lru_cache
 from .vector_store import get_vector_store
 from langchain.tools import tool
+from config import config
+import hashlib
+import redis
 
 
 class VehicleRetriever:
@@ -11,19 +15,25 @@ class VehicleRetriever:
     
     def __init__(self):
         self.vector_store = get_vector_store()
+        
+        # Hot cache in front of Chroma: Redis when configured (shared across
+        # workers), otherwise an in-process LRU
+        self._redis = redis.Redis.from_url(config.REDIS_URL) if config.REDIS_URL else None
+        self._local_cache = lru_cache(maxsize=config.RAG_CACHE_SIZE)(self._retrieve_and_format)
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict]:
+    def retrieve(self, query: str, top_k: int = 5, raise_errors: bool = False) -> List[Dict]:
         """
         Retrieve relevant documents for a query.
         
         Args:
             query: Search query
             top_k: Number of results to return
+            raise_errors: Propagate vector store failures instead of returning no documents
             
         Returns:
             List of relevant documents with metadata
         """
-        results = self.vector_store.query(query, n_results=top_k)
+        results = self.vector_store.query(query, n_results=top_k, raise_errors=raise_errors)
         
         # Format results
         formatted_results = []
@@ -42,6 +52,64 @@ class VehicleRetriever:
         
         return formatted_results
     
+    def retrieve_and_format_cached(self, query: str, top_k: int = 5) -> str:
+        """
+        Retrieve documents for a query and format them as LLM context, with caching.
+        
+        The formatted string is what ends up in the prompt, so caching it
+        skips both the vector search and the formatting, and keeps the
+        context byte-identical across repeat queries.
+        
+        Args:
+            query: Search query
+            top_k: Number of results to return
+            
+        Returns:
+            Formatted context string
+        """
+        # A failed retrieval raises out of _retrieve_and_format, so it is never
+        # cached and the next call retries the vector store
+        try:
+            if self._redis is None:
+                return self._local_cache(query, top_k)
+            
+            key = self._cache_key(query, top_k)
+            cached = self._redis_call('get', key)
+            if cached:
+                return cached.decode()
+            
+            context = self._retrieve_and_format(query, top_k)
+        except Exception as e:
+            print(f"Error retrieving context: {str(e)}")
+            return self.format_context([])
+        
+        self._redis_call('setex', key, config.RAG_CACHE_TTL, context)
+        return context
+    
+    def invalidate_cache(self):
+        """Drop cached retrievals, e.g. after new documents are indexed."""
+        if self._redis is None:
+            self._local_cache.cache_clear()
+        else:
+            # Bumping the version orphans every existing key; they expire via TTL
+            self._redis_call('incr', 'rag:version')
+    
+    def _cache_key(self, query: str, top_k: int) -> str:
+        version = int(self._redis_call('get', 'rag:version') or 0)
+        digest = hashlib.blake2b(query.encode(), digest_size=16).hexdigest()
+        return f"rag:v{version}:{top_k}:{digest}"
+    
+    def _redis_call(self, method: str, *args) -> Optional[bytes]:
+        """Run a Redis command, treating connection errors as cache misses."""
+        try:
+            return getattr(self._redis, method)(*args)
+        except redis.RedisError as e:
+            print(f"Redis cache error: {str(e)}")
+            return None
+    
+    def _retrieve_and_format(self, query: str, top_k: int) -> str:
+        return self.format_context(self.retrieve(query, top_k, raise_errors=True))
+    
     def format_context(self, retrieved_docs: List[Dict]) -> str:
         """
         Format retrieved documents into context string for LLM.
@@ -86,9 +154,7 @@ def retrieve_vehicle_knowledge(query: str) -> str:
     Returns:
         Relevant information from knowledge base
     """
-    retriever = VehicleRetriever()
-    docs = retriever.retrieve(query)
-    return retriever.format_context(docs)
+    return vehicle_retriever.retrieve_and_format_cached(query)
 
 
 # Export retriever instance
@@ -3,10 +3,58 @@ Vector store management using ChromaDB for RAG pipeline.
 """
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from sentence_transformers import util
+from collections import OrderedDict
 from typing import List, Dict, Optional
 from config import config
+from .embedder import get_embedder
+import hashlib
+import numpy as np
 import os
+import threading
+
+
+COLLECTION_NAME = "vehicle_knowledge"
+
+# Recent query embeddings kept to skip re-encoding repeated RAG queries
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Documents encoded and written to Chroma per chunk, bounding peak memory on bulk loads
+CHROMA_ADD_BATCH_SIZE = 512
+
+# Inner-product space (embeddings are L2-normalized on the way in, so the dot
+# product is the cosine) plus wider HNSW graph/search beams than Chroma's
+# defaults (M=16, construction_ef=100, search_ef=10) for better recall
+COLLECTION_METADATA = {
+    "description": "Vehicle market information and historical data",
+    "hnsw:space": "ip",
+    "hnsw:M": 24,
+    "hnsw:construction_ef": 128,
+    "hnsw:search_ef": 100,
+    "hnsw:batch_size": 1000,
+    "hnsw:sync_threshold": 10000
+}
+
+
+def hnsw_outdated(collection) -> bool:
+    """Check whether a collection was created with different HNSW settings than COLLECTION_METADATA."""
+    current = collection.metadata or {}
+    return any(
+        current.get(key) != value
+        for key, value in COLLECTION_METADATA.items()
+        if key.startswith("hnsw:")
+    )
+
+
+def _to_gpu(embeddings: np.ndarray):
+    """Copy an embedding matrix to the GPU as fp16, or return None without CUDA."""
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    return torch.from_numpy(embeddings).to('cuda', dtype=torch.float16)
 
 
 class VectorStore:
@@ -25,14 +73,128 @@ class VectorStore:
             )
         )
         
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(config.EMBEDDING_MODEL)
+        # Shared embedding model
+        self.embedding_model = get_embedder()
         
         # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="vehicle_knowledge",
-            metadata={"description": "Vehicle market information and historical data"}
-        )
+        self.collection = self._open_collection()
+        
+        # In-memory copy of the collection for brute-force search (RAG_CACHE),
+        # loaded lazily by ensure_cache_warm()
+        self._cache_emb: Optional[np.ndarray] = None
+        self._cache_ids: List[str] = []
+        self._cache_documents: List[str] = []
+        self._cache_metadatas: List[Dict] = []
+        # fp16 copy of _cache_emb on the GPU when CUDA is available
+        self._cache_gpu = None
+        self._cache_lock = threading.Lock()
+        
+        # sha256(query text) -> normalized query embedding, in LRU order
+        self._query_embeddings: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+    
+    def _open_collection(self):
+        """Open (or create) the knowledge collection, warning if its index settings are outdated."""
+        # get_or_create avoids the get-then-create race when several workers start together
+        collection = self.client.get_or_create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+        if hnsw_outdated(collection):
+            # HNSW settings are fixed at creation; rebuilding is left to the
+            # one-shot migration so workers never drop the collection themselves
+            print(
+                f"Warning: collection '{COLLECTION_NAME}' uses outdated HNSW settings; "
+                f"run `python -m rag.migrate` with the API stopped to rebuild it"
+            )
+        return collection
+    
+    def ensure_cache_warm(self):
+        """Load every stored embedding, document and metadata into memory."""
+        if self._cache_emb is not None:
+            return
+        
+        with self._cache_lock:
+            if self._cache_emb is not None:
+                return
+            
+            pages, ids, documents, metadatas = [], [], [], []
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["embeddings", "metadatas", "documents"],
+                    limit=10000,
+                    offset=offset
+                )
+                if not page['ids']:
+                    break
+                pages.append(np.asarray(page['embeddings'], dtype=np.float32))
+                ids.extend(page['ids'])
+                documents.extend(page['documents'])
+                metadatas.extend(page['metadatas'])
+                offset += len(page['ids'])
+            
+            if pages:
+                embeddings = np.vstack(pages)
+                # Older documents may have been stored unnormalized
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings /= np.maximum(norms, 1e-12)
+            else:
+                dim = self.embedding_model.get_sentence_embedding_dimension()
+                embeddings = np.empty((0, dim), dtype=np.float32)
+            
+            self._cache_ids = ids
+            self._cache_documents = documents
+            self._cache_metadatas = metadatas
+            self._cache_gpu = _to_gpu(embeddings)
+            self._cache_emb = embeddings
+            print(f"Loaded {len(ids)} embeddings into the in-memory RAG cache")
+    
+    def _clear_cache(self):
+        with self._cache_lock:
+            self._cache_emb = None
+            self._cache_gpu = None
+            self._cache_ids = []
+            self._cache_documents = []
+            self._cache_metadatas = []
+    
+    def _query_cache(self, query_embedding: np.ndarray, n_results: int) -> Dict:
+        """Exact nearest-neighbour search over the in-memory cache, in Chroma's result shape."""
+        with self._cache_lock:
+            embeddings, gpu_embeddings = self._cache_emb, self._cache_gpu
+            ids, documents, metadatas = self._cache_ids, self._cache_documents, self._cache_metadatas
+        
+        n = min(n_results, len(ids))
+        if n == 0:
+            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        
+        if gpu_embeddings is not None:
+            # One fused GEMM + top-k on the device; embeddings are unit length so dot = cosine
+            import torch
+            query = torch.tensor(query_embedding, device=gpu_embeddings.device, dtype=gpu_embeddings.dtype)
+            hits = util.semantic_search(
+                query.unsqueeze(0),
+                gpu_embeddings[:len(ids)],
+                top_k=n,
+                score_function=util.dot_score
+            )[0]
+            top = np.array([hit['corpus_id'] for hit in hits])
+            top_scores = np.array([hit['score'] for hit in hits], dtype=np.float32)
+        else:
+            scores = embeddings[:len(ids)] @ query_embedding
+            top = np.argpartition(-scores, n - 1)[:n]
+            top = top[np.argsort(-scores[top])]
+            top_scores = scores[top]
+        
+        # Report distances in the collection's space so relevance scores match Chroma's
+        if (self.collection.metadata or {}).get('hnsw:space', 'l2') == 'l2':
+            distances = 2.0 - 2.0 * top_scores  # squared L2 of unit vectors
+        else:
+            distances = 1.0 - top_scores
+        
+        return {
+            'ids': [[ids[i] for i in top]],
+            'documents': [[documents[i] for i in top]],
+            'metadatas': [[metadatas[i] for i in top]],
+            'distances': [distances.tolist()]
+        }
     
     def add_documents(self, documents: List[str], metadatas: List[Dict], ids: List[str]):
         """
@@ -44,29 +206,55 @@ class VectorStore:
             ids: List of unique document IDs
         """
         try:
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(documents).tolist()
+            added = []
+            for start in range(0, len(documents), CHROMA_ADD_BATCH_SIZE):
+                end = start + CHROMA_ADD_BATCH_SIZE
+                
+                # Generate embeddings in one batched call per chunk rather than one
+                # forward pass per document. encode() already sorts inputs by length
+                # so batches carry little padding, and Chroma takes the float32
+                # ndarray without a list copy.
+                embeddings = self.embedding_model.encode(
+                    documents[start:end],
+                    batch_size=config.EMBEDDING_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ).astype(np.float32, copy=False)
+                
+                # Add to collection
+                self.collection.add(
+                    documents=documents[start:end],
+                    embeddings=embeddings,
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
+                )
+                added.append(embeddings)
             
-            # Add to collection
-            self.collection.add(
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
+            with self._cache_lock:
+                if self._cache_emb is not None and added:
+                    self._cache_emb = np.vstack([self._cache_emb] + added)
+                    if self._cache_gpu is not None:
+                        self._cache_gpu = _to_gpu(self._cache_emb)
+                    # Rebind rather than extend so a concurrent query keeps a consistent snapshot
+                    self._cache_ids = self._cache_ids + list(ids)
+                    self._cache_documents = self._cache_documents + list(documents)
+                    self._cache_metadatas = self._cache_metadatas + list(metadatas)
             
             print(f"Added {len(documents)} documents to vector store")
         
         except Exception as e:
             print(f"Error adding documents: {str(e)}")
     
-    def query(self, query_text: str, n_results: int = None) -> Dict:
+    def query(self, query_text: str, n_results: int = None, raise_errors: bool = False) -> Dict:
         """
         Query the vector store for similar documents.
         
         Args:
             query_text: Query string
             n_results: Number of results to return (default: config.RAG_TOP_K)
+            raise_errors: Propagate failures instead of returning empty results,
+                so callers that cache results can tell a miss from an error
             
         Returns:
             Dictionary with documents, metadatas, and distances
@@ -76,7 +264,11 @@ class VectorStore:
         
         try:
             # Generate query embedding
-            query_embedding = self.embedding_model.encode([query_text]).tolist()
+            query_embedding = self._embed_query(query_text)
+            
+            if config.RAG_CACHE:
+                self.ensure_cache_warm()
+                return self._query_cache(query_embedding[0], n_results)
             
             # Query collection
             results = self.collection.query(
@@ -87,13 +279,42 @@ class VectorStore:
             return results
         
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error querying vector store: {str(e)}")
             return {'documents': [], 'metadatas': [], 'distances': []}
     
+    def _embed_query(self, query_text: str) -> np.ndarray:
+        """Encode a query as a (1, dim) normalized embedding, reusing recent results."""
+        key = hashlib.sha256(query_text.encode()).digest()
+        
+        with self._query_embeddings_lock:
+            embedding = self._query_embeddings.get(key)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(key)
+                return embedding
+        
+        embedding = self.embedding_model.encode(
+            [query_text],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        # Shared between callers, so make sure nobody modifies it in place
+        embedding.flags.writeable = False
+        
+        with self._query_embeddings_lock:
+            self._query_embeddings[key] = embedding
+            if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        
+        return embedding
+    
     def delete_collection(self):
         """Delete the collection (for testing/reset purposes)."""
         try:
-            self.client.delete_collection("vehicle_knowledge")
+            self.client.delete_collection(COLLECTION_NAME)
+            self._clear_cache()
             print("Collection deleted")
         except Exception as e:
             print(f"Error deleting collection: {str(e)}")
@@ -1,28 +0,0 @@
-
-import requests
-
-url = "https://riyasewana.com/search/toyota/corolla/1995-2003"
-headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-    'Accept-Language': 'en-US,en;q=0.9',
-    'Accept-Encoding': 'gzip, deflate, br',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1',
-    'Sec-Fetch-Dest': 'document',
-    'Sec-Fetch-Mode': 'navigate',
-    'Sec-Fetch-Site': 'none',
-    'Sec-Fetch-User': '?1',
-    'Cache-Control': 'max-age=0'
-}
-
-print(f"Fetching {url}...")
-try:
-    response = requests.get(url, headers=headers, timeout=10)
-    print(f"Status Code: {response.status_code}")
-    if response.status_code == 200:
-        print("Success! Page content length:", len(response.content))
-    else:
-        print("Failed.")
-except Exception as e:
-    print(f"Error: {e}")
@@ -5,8 +5,15 @@ This tool is used by the LangGraph agent.
 from typing import List, Dict, Optional
 from langchain.tools import tool
 from .scrapers import RiyasewanaScraper, IkmanScraper, PatpatScraper
+from config import config
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import weakref
+import numpy as np
+from curl_cffi.requests import AsyncSession
+
+
+_U64_MASK = 0xFFFFFFFFFFFFFFFF
+_KEY_MIX = 0x9E3779B97F4A7C15
 
 
 class VehicleScraperTool:
@@ -18,11 +25,58 @@ class VehicleScraperTool:
             'ikman': IkmanScraper(),
             # 'patpat': PatpatScraper()  # Disabled for now
         }
+        # One long-lived session per event loop; curl_cffi sessions are bound to
+        # the loop they were created on
+        self._sessions = weakref.WeakKeyDictionary()
+    
+    def _get_session(self) -> AsyncSession:
+        """
+        Get the impersonating session for the running event loop.
+        
+        The session outlives individual searches, so keep-alive connections to
+        each site are reused across requests instead of paying a new TLS
+        handshake per search.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None:
+            session = AsyncSession(impersonate="chrome110", max_clients=config.SCRAPER_MAX_CONNECTIONS)
+            self._sessions[loop] = session
+        return session
+    
+    async def aclose(self):
+        """Close the session of the running event loop (e.g. on server shutdown)."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+    
+    async def _run_and_close(self, coro):
+        """Run a coroutine for a sync wrapper, closing the session before its loop goes away."""
+        try:
+            return await coro
+        finally:
+            await self.aclose()
     
     def search_all(self, query: str, sources: Optional[List[str]] = None) -> List[Dict]:
         """
         Search for vehicles across all or specified sources.
         
+        Synchronous wrapper around asearch_all for scripts and tools; must not
+        be called from inside a running event loop.
+        
+        Args:
+            query: Search query (e.g., "Toyota Aqua 2018")
+            sources: List of sources to search (default: all)
+            
+        Returns:
+            Aggregated and deduplicated list of vehicles
+        """
+        return asyncio.run(self._run_and_close(self.asearch_all(query, sources)))
+    
+    async def asearch_all(self, query: str, sources: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Search for vehicles across all or specified sources concurrently.
+        
         Args:
             query: Search query (e.g., "Toyota Aqua 2018")
             sources: List of sources to search (default: all)
@@ -30,63 +84,98 @@ class VehicleScraperTool:
         Returns:
             Aggregated and deduplicated list of vehicles
         """
+        # Total time is roughly that of the slowest site rather than the sum
+        vehicles = await self._search_sources(self._get_session(), query, sources)
+        
+        # Deduplicate and sort
+        return self._dedupe_and_sort(vehicles)
+    
+    async def _search_sources(self, session: AsyncSession, query: str,
+                              sources: Optional[List[str]] = None) -> List[Dict]:
+        """Run one query against every source concurrently and merge the raw results."""
         if sources is None:
             sources = list(self.scrapers.keys())
+        sources = [source for source in sources if source in self.scrapers]
+        
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.scrapers[source].search_async(query, session), timeout=60)
+                for source in sources
+            ),
+            return_exceptions=True
+        )
         
         all_vehicles = []
+        for source, result in zip(sources, results):
+            if isinstance(result, Exception):
+                print(f"Error scraping {source}: {str(result)}")
+            else:
+                all_vehicles.extend(result)
         
-        # Use ThreadPoolExecutor for parallel scraping
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {}
-            
-            for source in sources:
-                if source in self.scrapers:
-                    future = executor.submit(self.scrapers[source].search, query)
-                    futures[future] = source
-            
-            for future in futures:
-                try:
-                    vehicles = future.result(timeout=60)
-                    all_vehicles.extend(vehicles)
-                except Exception as e:
-                    print(f"Error scraping {futures[future]}: {str(e)}")
+        return all_vehicles
+    
+    def _dedupe_and_sort(self, vehicles: List[Dict]) -> List[Dict]:
+        """
+        Remove duplicate listings and sort by price (ascending), then year (descending).
         
-        # Deduplicate and sort
-        deduplicated = self._deduplicate_vehicles(all_vehicles)
-        sorted_vehicles = self._sort_vehicles(deduplicated)
-        
-        return sorted_vehicles
-    
-    def _deduplicate_vehicles(self, vehicles: List[Dict]) -> List[Dict]:
-        """Remove duplicate listings based on title and price similarity."""
-        seen = set()
-        unique_vehicles = []
-        
-        for vehicle in vehicles:
-            # Create a simple hash based on title and price
-            key = (
-                vehicle.get('title', '').lower().strip(),
-                int(vehicle.get('price', 0))
-            )
+        Listings are keyed on (title, price); the first occurrence is kept and
+        listings without a price are dropped. Each key is folded into a single
+        64-bit integer so deduplication is one np.unique over a uint64 array.
+        
+        Args:
+            vehicles: Listings from all sources
             
-            if key not in seen and key[1] > 0:
-                seen.add(key)
-                unique_vehicles.append(vehicle)
-        
-        return unique_vehicles
-    
-    def _sort_vehicles(self, vehicles: List[Dict]) -> List[Dict]:
-        """Sort vehicles by relevance and price."""
-        # Sort by price (ascending) and then by year (descending)
-        return sorted(
-            vehicles,
-            key=lambda x: (x.get('price', 0), -x.get('year', 0))
+        Returns:
+            Deduplicated and sorted listings
+        """
+        if not vehicles:
+            return []
+        
+        arr = np.array(
+            [
+                (
+                    # str hashes are cached on the string object; the price is mixed
+                    # in with a golden-ratio multiply so equal titles at different
+                    # prices land far apart
+                    (hash(v.get('title', '').lower().strip()) ^ (int(v.get('price', 0)) * _KEY_MIX))
+                    & _U64_MASK,
+                    # Full price for sorting; only the key above truncates it
+                    float(v.get('price', 0)),
+                    v.get('year', 0)
+                )
+                for v in vehicles
+            ],
+            dtype=[('k', 'u8'), ('p', 'f8'), ('y', 'i2')]
         )
+        
+        # First occurrence of each key, back in original order so ties sort stably
+        _, idx = np.unique(arr['k'], return_index=True)
+        idx = np.sort(idx)
+        idx = idx[arr['p'][idx] > 0]
+        
+        # lexsort is stable and sorts by the last key first
+        order = np.lexsort((-arr['y'][idx], arr['p'][idx]))
+        return [vehicles[i] for i in idx[order]]
     
     def compare_vehicles(self, queries: List[str]) -> Dict:
         """
         Compare multiple vehicle models.
         
+        Synchronous wrapper around acompare_vehicles; must not be called from
+        inside a running event loop.
+        
+        Args:
+            queries: List of vehicle queries to compare
+            
+        Returns:
+            Dictionary with comparison data
+        """
+        return asyncio.run(self._run_and_close(self.acompare_vehicles(queries)))
+    
+    async def acompare_vehicles(self, queries: List[str]) -> Dict:
+        """
+        Compare multiple vehicle models, scraping every (query, source) pair at once.
+        
         Args:
             queries: List of vehicle queries to compare
             
@@ -98,8 +187,14 @@ class VehicleScraperTool:
             'summary': {}
         }
         
-        for query in queries:
-            vehicles = self.search_all(query)
+        # Wall time is about one site round-trip regardless of how many models are compared
+        session = self._get_session()
+        results = await asyncio.gather(
+            *(self._search_sources(session, query) for query in queries)
+        )
+        
+        for query, raw_vehicles in zip(queries, results):
+            vehicles = self._dedupe_and_sort(raw_vehicles)
             comparison['vehicles'][query] = vehicles
             
             if vehicles:
@@ -127,8 +222,7 @@ def search_vehicle_listings(query: str) -> str:
     Returns:
         Formatted string with vehicle listings and prices
     """
-    scraper_tool = VehicleScraperTool()
-    vehicles = scraper_tool.search_all(query)
+    vehicles = vehicle_scraper.search_all(query)
     
     if not vehicles:
         return f"No vehicles found for query: {query}"
@@ -158,10 +252,9 @@ def compare_vehicle_prices(vehicle_models: str) -> str:
     Returns:
         Formatted comparison with price statistics
     """
-    scraper_tool = VehicleScraperTool()
     queries = [q.strip() for q in vehicle_models.split(',')]
     
-    comparison = scraper_tool.compare_vehicles(queries)
+    comparison = vehicle_scraper.compare_vehicles(queries)
     
     result = "Vehicle Price Comparison:\n\n"
     
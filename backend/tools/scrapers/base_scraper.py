@@ -1,17 +1,87 @@
 """
 Base scraper class with common functionality for all vehicle website scrapers.
 """
+import asyncio
+import re
+import threading
 import time
+import weakref
 from curl_cffi import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from curl_cffi.requests import AsyncSession
+from functools import lru_cache
+from typing import List, Dict, Optional, NamedTuple, Tuple, Union
 from abc import ABC, abstractmethod
 from config import config
 
+try:
+    # RE2 runs the title/query patterns as a DFA; none of them need backreferences or lookaround
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+_PRICE_CLEAN = re.compile(r'[^0-9.]')
+
+# Common Sri Lankan vehicle makes as (lowercase, canonical) pairs, lowercased once
+# at import and scanned with one alternation instead of a loop per make
+_MAKES = tuple((make.lower(), make) for make in ('Toyota', 'Honda', 'Nissan', 'Suzuki', 'Mitsubishi', 'Mazda',
+                                                 'BMW', 'Benz', 'Mercedes', 'Audi', 'Hyundai', 'KIA',
+                                                 'Volkswagen'))
+_MAKE_CANON = dict(_MAKES)
+_MAKE_ALTERNATION = '|'.join(lower for lower, _ in _MAKES)
+# Makes and years of a listing title found in a single scan. Flags are inline so
+# the pattern compiles the same way under either engine. A make swallows a
+# following hyphen so "Mercedes-Benz" leaves none behind, while hyphens inside
+# model names ("CR-V", "X-Trail") are kept.
+_TITLE_TOKEN_RE = _regex.compile(
+    r'(?i)\b(?:(?P<make>' + _MAKE_ALTERNATION + r')\b-?|(?P<year>19\d{2}|20\d{2})\b)'
+)
+
+# Listing titles repeat within and across result pages
+TITLE_CLASSIFY_CACHE_SIZE = 4096
+
+# One long-lived impersonating session per thread, shared by every scraper
+# instance on that thread, so sync fetches reuse the TLS/HTTP2 connection even
+# when scrapers are created per request. curl handles are not thread-safe, so
+# threads never share one and concurrent fetches to different sites run in parallel.
+_THREAD_SESSIONS = threading.local()
+
+
+def _thread_session() -> requests.Session:
+    """Get the calling thread's sync session, creating it on first use."""
+    session = getattr(_THREAD_SESSIONS, 'session', None)
+    if session is None:
+        session = _THREAD_SESSIONS.session = requests.Session(impersonate="chrome110")
+    return session
+
+
+class RawListing(NamedTuple):
+    """
+    Fields of one listing as scraped, before standardization.
+    
+    A tuple instead of a per-listing dict: no hash table per record, and
+    the defaults double as the fallbacks used by _standardize_vehicle.
+    """
+    title: str = ''
+    price: str = ''
+    year: str = ''
+    make: str = ''
+    model: str = ''
+    mileage: str = 'N/A'
+    condition: str = 'N/A'
+    location: str = 'N/A'
+    url: str = ''
+    source: str = ''
+    image_url: str = ''
+
 
 class BaseScraper(ABC):
     """Abstract base class for vehicle scrapers."""
     
+    # Site name used in log messages
+    source_name = ''
+    
     def __init__(self):
         self.timeout = config.SCRAPER_TIMEOUT
         self.rate_limit = config.SCRAPER_RATE_LIMIT
@@ -19,33 +89,102 @@ class BaseScraper(ABC):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
-        self.last_request_time = 0
+        # Earliest time (time.monotonic) the next request to this site may start
+        self._next_request_time = 0.0
+        self._rate_lock = threading.Lock()
+        # Async waiters queue on a per-event-loop lock instead of reserving slots
+        # ahead, so a search cancelled mid-wait consumes no slot
+        self._async_rate_locks = weakref.WeakKeyDictionary()
+    
+    def _reserve_request_slot(self) -> float:
+        """
+        Reserve the next request slot for this site.
+        
+        Each caller claims its own slot rate_limit seconds after the previous
+        one, so concurrent requests are spaced out instead of all firing once
+        the same wait elapses. The lock is per scraper, so different sites
+        never wait on each other.
+        
+        Returns:
+            Seconds to wait before sending the request
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_time)
+            self._next_request_time = slot + self.rate_limit
+        return slot - now
     
     def _rate_limit_wait(self):
         """Implement rate limiting between requests."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.rate_limit:
-            time.sleep(self.rate_limit - elapsed)
-        self.last_request_time = time.time()
+        delay = self._reserve_request_slot()
+        if delay > 0:
+            time.sleep(delay)
     
-    def _fetch_page(self, url: str) -> Optional[BeautifulSoup]:
-        """Fetch and parse a webpage."""
+    def _claim_request_slot(self) -> float:
+        """
+        Claim the next request slot for this site only if it is already open.
+        
+        Returns:
+            0 if the slot was claimed, otherwise seconds until it opens
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            if now < self._next_request_time:
+                return self._next_request_time - now
+            self._next_request_time = now + self.rate_limit
+        return 0.0
+    
+    async def _rate_limit_wait_async(self):
+        """
+        Rate limiting for the async path, without blocking the event loop.
+        
+        Concurrent requests to this site take turns on an asyncio lock and
+        claim a slot only once it is due. A request cancelled while queued or
+        sleeping (e.g. by the per-site timeout) therefore never pushes back
+        the requests after it.
+        """
+        loop = asyncio.get_running_loop()
+        lock = self._async_rate_locks.get(loop)
+        if lock is None:
+            lock = self._async_rate_locks[loop] = asyncio.Lock()
+        
+        async with lock:
+            # Loops only if a sync caller claimed the slot while we slept
+            while (delay := self._claim_request_slot()) > 0:
+                await asyncio.sleep(delay)
+    
+    def _fetch_html(self, url: str) -> Optional[bytes]:
+        """Fetch a webpage and return its raw content."""
         try:
             self._rate_limit_wait()
             # Use curl_cffi to impersonate Chrome for bypassing bot protection (JA3/TLS fingerprinting)
-            response = requests.get(
-                url, 
-                headers=self.headers, 
+            response = _thread_session().get(url, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response.content
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            return None
+    
+    async def _fetch_html_async(self, url: str, session: AsyncSession) -> Optional[bytes]:
+        """Fetch a webpage on a shared async session and return its raw content."""
+        try:
+            await self._rate_limit_wait_async()
+            response = await session.get(
+                url,
+                headers=self.headers,
                 timeout=self.timeout,
                 impersonate="chrome110"
             )
             response.raise_for_status()
-            return BeautifulSoup(response.content, 'lxml')
+            return response.content
         except Exception as e:
             print(f"Error fetching {url}: {str(e)}")
             return None
     
-    @abstractmethod
+    def _parse_page(self, content: bytes) -> List[Dict]:
+        """Parse a search results page into standardized vehicles."""
+        return self._parse_listings(self._parse_html(content))
+    
     def search(self, query: str, **kwargs) -> List[Dict]:
         """
         Search for vehicles based on query.
@@ -57,12 +196,85 @@ class BaseScraper(ABC):
         Returns:
             List of vehicle dictionaries with standardized fields
         """
+        try:
+            content = self._fetch_html(self._build_search_url(query, **kwargs))
+            return self._parse_page(content) if content else []
+        except Exception as e:
+            print(f"Error searching {self.source_name}: {str(e)}")
+            return []
+    
+    async def search_async(self, query: str, session: AsyncSession, **kwargs) -> List[Dict]:
+        """
+        Async version of search that fetches on a shared session.
+        
+        Args:
+            query: Search query (e.g., "Toyota Aqua 2018")
+            session: curl_cffi AsyncSession reused across requests
+            **kwargs: Additional search parameters
+            
+        Returns:
+            List of vehicle dictionaries with standardized fields
+        """
+        try:
+            content = await self._fetch_html_async(self._build_search_url(query, **kwargs), session)
+            if not content:
+                return []
+            # HTML parsing is CPU-bound, keep it off the event loop
+            return await asyncio.to_thread(self._parse_page, content)
+        except Exception as e:
+            print(f"Error searching {self.source_name}: {str(e)}")
+            return []
+    
+    @staticmethod
+    @lru_cache(maxsize=TITLE_CLASSIFY_CACHE_SIZE)
+    def _classify_title(title: str) -> Tuple[str, str, str]:
+        """
+        Extract vehicle make, model and year from a title in one regex scan.
+        
+        Cached because the same titles recur across listings and searches.
+        
+        Returns:
+            Tuple of (make, model, year); the model is the title without makes and years
+        """
+        make = ''
+        year = ''
+        model_parts = []
+        last_end = 0
+        for match in _TITLE_TOKEN_RE.finditer(title):
+            token = match.group('make')
+            if token:
+                make = make or _MAKE_CANON[token.lower()]
+            else:
+                year = year or match.group('year')
+            model_parts.append(title[last_end:match.start()])
+            last_end = match.end()
+        model_parts.append(title[last_end:])
+        # Separators left between removed makes/years (e.g. "2015 - 2018") are dropped
+        model = ' '.join(token for token in ''.join(model_parts).split() if token != '-')
+        return make, model.strip('-'), year
+    
+    @abstractmethod
+    def _build_search_url(self, query: str, **kwargs) -> str:
+        """Build the search results URL for a query."""
         pass
     
-    def _standardize_vehicle(self, raw_data: Dict) -> Dict:
+    @abstractmethod
+    def _parse_html(self, content: bytes):
+        """Parse raw HTML into the tree type _parse_listings expects."""
+        pass
+    
+    @abstractmethod
+    def _parse_listings(self, soup) -> List[Dict]:
+        """Extract standardized vehicles from a parsed search results page."""
+        pass
+    
+    def _standardize_vehicle(self, raw_data: Union[RawListing, Dict]) -> Dict:
         """
         Standardize vehicle data format across all scrapers.
         
+        Args:
+            raw_data: Scraped listing; a dict is read with RawListing's defaults
+            
         Returns:
             {
                 'title': str,
@@ -78,25 +290,34 @@ class BaseScraper(ABC):
                 'image_url': str
             }
         """
+        if isinstance(raw_data, dict):
+            raw_data = RawListing._make(
+                raw_data.get(field, default) for field, default in RawListing._field_defaults.items()
+            )
+        
         return {
-            'title': raw_data.get('title', ''),
-            'price': self._parse_price(raw_data.get('price', '')),
-            'year': self._parse_year(raw_data.get('year', '')),
-            'make': raw_data.get('make', ''),
-            'model': raw_data.get('model', ''),
-            'mileage': raw_data.get('mileage', 'N/A'),
-            'condition': raw_data.get('condition', 'N/A'),
-            'location': raw_data.get('location', 'N/A'),
-            'url': raw_data.get('url', ''),
-            'source': raw_data.get('source', ''),
-            'image_url': raw_data.get('image_url', '')
+            'title': raw_data.title,
+            'price': self._parse_price(raw_data.price),
+            'year': self._parse_year(raw_data.year),
+            'make': raw_data.make,
+            'model': raw_data.model,
+            'mileage': raw_data.mileage,
+            'condition': raw_data.condition,
+            'location': raw_data.location,
+            'url': raw_data.url,
+            'source': raw_data.source,
+            'image_url': raw_data.image_url
         }
     
     def _parse_price(self, price_str: str) -> float:
         """Extract numeric price from string."""
         try:
-            # Remove currency symbols and other non-numeric characters (except dot)
-            cleaned = price_str.lower().replace('rs.', '').replace('rs', '').replace('lkr', '').replace(',', '').strip()
+            # Remove currency symbols and other non-numeric characters (except dot);
+            # strip dots left over from prefixes like "Rs." or suffixes like "/="
+            cleaned = _PRICE_CLEAN.sub('', price_str).strip('.')
+            if cleaned.isdigit():
+                # Prices are almost always whole rupees, skip the float parser
+                return float(int(cleaned))
             return float(cleaned)
         except:
             return 0.0
@@ -105,8 +326,7 @@ class BaseScraper(ABC):
         """Extract year from string."""
         try:
             # Extract 4-digit year
-            import re
-            match = re.search(r'\b(19|20)\d{2}\b', str(year_str))
+            match = _YEAR_RE.search(str(year_str))
             return int(match.group()) if match else 0
         except:
             return 0
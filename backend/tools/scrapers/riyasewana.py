@@ -1,157 +1,219 @@
 """
 Riyasewana.com vehicle scraper.
 """
-from typing import List, Dict
-from .base_scraper import BaseScraper
-import re
+from typing import List, Dict, Optional, NamedTuple
+from functools import lru_cache
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+from .base_scraper import BaseScraper, RawListing, _regex, _MAKE_ALTERNATION
+import logging
+import string
+
+logger = logging.getLogger(__name__)
+
+
+# Flags are written inline so the patterns compile the same way under either engine
+_YEAR_RE = _regex.compile(r'\b(19\d{2}|20\d{2})\b')
+# Full 4-digit years with hyphen(s) or 'to' separator
+_YEAR_RANGE_RE = _regex.compile(r'(?i)(19\d{2}|20\d{2})\s*(?:-+|to)\s*(19\d{2}|20\d{2})')
+_MULTIHYPHEN_RE = _regex.compile(r'-+')
+
+# Any known make (shared with BaseScraper's title classification)
+_MAKE_RE = _regex.compile(r'(?i)\b(' + _MAKE_ALTERNATION + r')\b')
+
+# Opening tag of a listing card (li.item or div.item) in the raw page bytes
+_CARD_START_RE = _regex.compile(rb'<(li|div)\s[^>]*?class="(?:[^"]*\s)?item[\s"]')
+# Detail spans mentioning "km" are mileage; spans without any digit are the location
+_DETAIL_CLASS_RE = _regex.compile(r'(?is)(?P<mileage>.*km.*)|(?P<location>\D*)')
+
+
+class _SlugTable(dict):
+    """str.translate table that deletes every character it does not map."""
+    
+    def __missing__(self, key):
+        return None
+
+
+# Lowercases ASCII letters, turns spaces into hyphens and drops anything else
+# that cannot appear in a URL slug, in one translate pass
+_SLUG_TABLE = _SlugTable({ord(char): char for char in string.ascii_lowercase + string.digits + '-'})
+_SLUG_TABLE.update({ord(char): char.lower() for char in string.ascii_uppercase})
+_SLUG_TABLE[ord(' ')] = '-'
+
+
+# Identical searches are common (e.g. re-running a comparison), so parsed
+# queries and model slugs are cached by query string
+QUERY_PARSE_CACHE_SIZE = 1024
+
+
+class QueryParts(NamedTuple):
+    """Components of a search query; immutable so parses can be cached."""
+    make: str = ''
+    model: str = ''
+    year: str = ''
+    year_start: str = ''
+    year_end: str = ''
+
+
+@lru_cache(maxsize=QUERY_PARSE_CACHE_SIZE)
+def _parse_query(query: str) -> QueryParts:
+    """Parse search query into components."""
+    year = ''
+    year_start = ''
+    year_end = ''
+    
+    # One pass strips every make from the query and records them in order;
+    # the first one is the make searched for
+    makes = []
+    
+    def take_make(match) -> str:
+        makes.append(match.group(1))
+        return ''
+    
+    query_clean = _MAKE_RE.sub(take_make, query.lower())
+    make = makes[0] if makes else ''
+    
+    # Extract year range (e.g., "1995-2003", "2015-2023", "2015 to 2023")
+    # Match full 4-digit years with hyphen or 'to' separator
+    year_range_match = _YEAR_RANGE_RE.search(query)
+    if year_range_match:
+        year_start = year_range_match.group(1)
+        year_end = year_range_match.group(2)
+        logger.debug("Extracted year range: %s-%s", year_start, year_end)
+    else:
+        # Extract single year (4 digits)
+        year_match = _YEAR_RE.search(query)
+        if year_match:
+            year = year_match.group(1)
+            logger.debug("Extracted single year: %s", year)
+    
+    # Model is remaining text once year and year ranges are removed
+    query_clean = _YEAR_RANGE_RE.sub('', query_clean)
+    query_clean = _YEAR_RE.sub('', query_clean)
+    
+    parts = QueryParts(make, query_clean.strip(), year, year_start, year_end)
+    logger.debug("Parsed query parts: %s", parts)
+    return parts
+
+
+@lru_cache(maxsize=QUERY_PARSE_CACHE_SIZE)
+def _format_model_name(model: str) -> str:
+    """Format model name for URL (lowercase with hyphens)."""
+    # Lowercase, replace spaces with hyphens and remove special characters
+    formatted = model.translate(_SLUG_TABLE)
+    # Remove multiple consecutive hyphens
+    formatted = _MULTIHYPHEN_RE.sub('-', formatted)
+    # Remove leading/trailing hyphens
+    formatted = formatted.strip('-')
+    return formatted
 
 
 class RiyasewanaScraper(BaseScraper):
     """Scraper for Riyasewana.com vehicle listings."""
     
+    source_name = 'Riyasewana'
+    
     def __init__(self):
         super().__init__()
         self.base_url = "https://riyasewana.com"
         self.search_url = f"{self.base_url}/search"
     
-    def search(self, query: str, **kwargs) -> List[Dict]:
+    def _build_search_url(self, query: str, **kwargs) -> str:
         """
-        Search for vehicles on Riyasewana.
+        Build the Riyasewana search URL.
         
         Args:
             query: Search query (e.g., "Toyota Aqua 2018")
             **kwargs: Additional parameters like min_price, max_price, year
             
         Returns:
-            List of standardized vehicle dictionaries
+            Search URL of the form /search/{brand}/{model}/{year_range}
         """
-        vehicles = []
-        
-        try:
-            # Parse query to extract make, model, year
-            query_parts = self._parse_query(query)
-            
-            # Build search URL
-            search_params = self._build_search_params(query_parts, **kwargs)
-            search_url = f"{self.search_url}/{search_params}"
-            
-            # Fetch search results page
-            soup = self._fetch_page(search_url)
-            if not soup:
-                return vehicles
-            
-            # Extract vehicle listings
-            listings = soup.find_all('li', class_='item')
-            if not listings:
-                # Try alternative selector used in some versions of the site
-                listings = soup.find_all('div', class_='item')
-            
-            for listing in listings[:self.max_results]:
-                vehicle_data = self._extract_vehicle_data(listing)
-                if vehicle_data:
-                    standardized = self._standardize_vehicle(vehicle_data)
-                    vehicles.append(standardized)
-        
-        except Exception as e:
-            print(f"Error searching Riyasewana: {str(e)}")
-        
-        return vehicles
+        # Parse query to extract make, model, year
+        query_parts = _parse_query(query)
+        search_params = self._build_search_params(query_parts, **kwargs)
+        return f"{self.search_url}/{search_params}"
     
-    def _parse_query(self, query: str) -> Dict:
-        """Parse search query into components."""
-        query_lower = query.lower()
-        parts = {
-            'make': '',
-            'model': '',
-            'year': '',
-            'year_start': '',
-            'year_end': ''
-        }
-        
-        # Common Sri Lankan vehicle makes
-        makes = ['toyota', 'honda', 'nissan', 'suzuki', 'mitsubishi', 'mazda', 
-                 'bmw', 'benz', 'mercedes', 'audi', 'hyundai', 'kia']
+    def _parse_html(self, content: bytes) -> LexborHTMLParser:
+        """Parse with selectolax; listing extraction only needs class lookups."""
+        return LexborHTMLParser(self._listing_region(content))
+    
+    def _listing_region(self, content: bytes) -> bytes:
+        """
+        Slice a results page down to the listing cards that will be extracted.
         
-        for make in makes:
-            if make in query_lower:
-                parts['make'] = make
+        The slice starts at the first card and ends before card max_results + 1,
+        so the head, navigation, footer and unused cards are never built into
+        the tree; lexbor places the cards in an implied <body> and closes the
+        elements left open by the cut. Only the card kind _parse_listings will
+        use is counted (li cards whenever any exist), so div.item elements
+        nested inside li cards do not end the slice early.
+        """
+        starts = {b'li': [], b'div': []}
+        for match in _CARD_START_RE.finditer(content):
+            starts[match.group(1)].append(match.start())
+            if len(starts[b'li']) > self.max_results:
                 break
         
-        # Extract year range (e.g., "1995-2003", "2015-2023", "2015 to 2023")
-        # Match full 4-digit years with hyphen or 'to' separator
-        year_range_match = re.search(r'(19\d{2}|20\d{2})\s*[-to]+\s*(19\d{2}|20\d{2})', query, re.IGNORECASE)
-        if year_range_match:
-            parts['year_start'] = year_range_match.group(1)
-            parts['year_end'] = year_range_match.group(2)
-            print(f"Extracted year range: {parts['year_start']}-{parts['year_end']}")
-        else:
-            # Extract single year (4 digits)
-            year_match = re.search(r'\b(19\d{2}|20\d{2})\b', query)
-            if year_match:
-                parts['year'] = year_match.group(1)
-                print(f"Extracted single year: {parts['year']}")
+        cards = starts[b'li'] or starts[b'div']
+        if not cards:
+            return content
+        if len(cards) > self.max_results:
+            return content[cards[0]:cards[self.max_results]]
+        return content[cards[0]:]
+    
+    def _parse_listings(self, tree: LexborHTMLParser) -> List[Dict]:
+        """Extract standardized vehicles from a Riyasewana search results page."""
+        # Extract vehicle listings in one scan of <body>; the div cards are an
+        # alternative markup used in some versions of the site
+        nodes = tree.body.css('li.item, div.item') if tree.body else []
+        listings = [node for node in nodes if node.tag == 'li'] or nodes
         
-        # Model is remaining text
-        query_clean = query.lower()
-        for make in makes:
-            query_clean = query_clean.replace(make, '')
-        # Remove year and year ranges
-        query_clean = re.sub(r'(19\d{2}|20\d{2})\s*[-to]+\s*(19\d{2}|20\d{2})', '', query_clean, flags=re.IGNORECASE)
-        query_clean = re.sub(r'\b(19\d{2}|20\d{2})\b', '', query_clean)
-        parts['model'] = query_clean.strip()
+        vehicles = []
+        for listing in listings[:self.max_results]:
+            vehicle_data = self._extract_vehicle_data(listing)
+            if vehicle_data:
+                standardized = self._standardize_vehicle(vehicle_data)
+                vehicles.append(standardized)
         
-        print(f"Parsed query parts: {parts}")
-        return parts
+        return vehicles
     
-    def _build_search_params(self, query_parts: Dict, **kwargs) -> str:
+    def _build_search_params(self, query_parts: QueryParts, **kwargs) -> str:
         """Build URL search parameters matching Riyasewana's structure: /search/{brand}/{model}/{year_range}."""
         params = []
         
         # Add brand (lowercase)
-        if query_parts.get('make'):
-            params.append(query_parts['make'].lower())
+        if query_parts.make:
+            params.append(query_parts.make.lower())
         
         # Add model (lowercase with hyphens)
-        if query_parts.get('model'):
-            model = self._format_model_name(query_parts['model'])
+        if query_parts.model:
+            model = _format_model_name(query_parts.model)
             params.append(model)
         
         # Add year or year range
-        if query_parts.get('year_start') and query_parts.get('year_end'):
-            params.append(f"{query_parts['year_start']}-{query_parts['year_end']}")
-        elif query_parts.get('year'):
+        if query_parts.year_start and query_parts.year_end:
+            params.append(f"{query_parts.year_start}-{query_parts.year_end}")
+        elif query_parts.year:
             # Single year - use as range (e.g., 2018 becomes 2018-2018)
-            params.append(f"{query_parts['year']}-{query_parts['year']}")
+            params.append(f"{query_parts.year}-{query_parts.year}")
         
         return '/'.join(params) if params else 'vehicles'
     
-    def _format_model_name(self, model: str) -> str:
-        """Format model name for URL (lowercase with hyphens)."""
-        # Replace spaces with hyphens
-        formatted = model.strip().replace(' ', '-')
-        # Remove special characters except hyphens and alphanumeric
-        formatted = re.sub(r'[^a-z0-9-]', '', formatted.lower())
-        # Remove multiple consecutive hyphens
-        formatted = re.sub(r'-+', '-', formatted)
-        # Remove leading/trailing hyphens
-        formatted = formatted.strip('-')
-        return formatted
-    
-    def _extract_vehicle_data(self, listing) -> Dict:
+    def _extract_vehicle_data(self, listing: LexborNode) -> Optional[RawListing]:
         """Extract vehicle data from a listing element."""
         try:
             # Title
-            title_elem = listing.find('h2', class_='more')
-            if title_elem and title_elem.find('a'):
-                title = title_elem.find('a').text.strip()
-                url_elem = title_elem.find('a')
-                url = url_elem['href'] if url_elem else ''
-            else:
-                title = ''
-                url = ''
+            title_elem = listing.css_first('h2.more a')
+            if not title_elem:
+                return None
+            title = title_elem.text().strip()
+            url = title_elem.attributes.get('href') or ''
+            # Cards without a linked title are placeholders, not listings
+            if not title or not url:
+                return None
             
             # Price and other details are in boxintxt divs
-            boxtext = listing.find('div', class_='boxtext')
+            boxtext = listing.css_first('div.boxtext')
             price = '0'
             location = ''
             mileage = ''
@@ -159,74 +221,54 @@ class RiyasewanaScraper(BaseScraper):
             
             if boxtext:
                 # Price is usually in the bold boxintxt
-                price_elem = boxtext.find('div', class_='boxintxt b')
+                price_elem = boxtext.css_first('div.boxintxt.b')
                 if price_elem:
-                    price = price_elem.text.strip()
+                    price = price_elem.text().strip()
                 
                 # Other details are in other boxintxt divs
-                details = boxtext.find_all('div', class_='boxintxt')
+                details = boxtext.css('div.boxintxt')
                 for detail in details:
-                    if not detail:
+                    text = detail.text(strip=True)
+                    match = _DETAIL_CLASS_RE.fullmatch(text)
+                    if not match:
                         continue
-                    text = detail.get_text(strip=True)
-                    if 'km' in text.lower():
+                    if match.lastgroup == 'mileage':
                         mileage = text
-                    elif not any(char.isdigit() for char in text) and text != price:
+                    elif text != price:
                         location = text
                     # Year might be in title or extracted elsewhere, but let's try to find it
                     # Riyasewana listings don't always have explicit year field in the boxtext
             
             # Extract year from title if not found
-            if not year and title:
-                import re
-                year_match = re.search(r'\b(19|20)\d{2}\b', title)
-                if year_match:
-                    year = year_match.group()
+            make, model, title_year = self._classify_title(title)
+            if not year:
+                year = title_year
             
             # Image
-            image_elem = listing.find('img')
-            image_url = image_elem.get('src', '') if image_elem else ''
+            image_elem = listing.css_first('img')
+            image_url = (image_elem.attributes.get('src') or '') if image_elem else ''
             # Fix relative image URLs
             if image_url.startswith('//'):
                 image_url = f"https:{image_url}"
             
-            data = {
-                'title': title,
-                'price': price,
-                'year': year,
-                'make': self._extract_make_from_title(title),
-                'model': self._extract_model_from_title(title),
-                'mileage': mileage,
-                'condition': 'Used',  # Default
-                'location': location,
-                'url': url,
-                'source': 'Riyasewana',
-                'image_url': image_url
-            }
+            data = RawListing(
+                title=title,
+                price=price,
+                year=year,
+                make=make,
+                model=model,
+                mileage=mileage,
+                condition='Used',  # Default
+                location=location,
+                url=url,
+                source='Riyasewana',
+                image_url=image_url
+            )
             return data
         
         except Exception as e:
-            print(f"DEBUG: Error extracting vehicle data: {e}")
-            return {}
-    
-    def _extract_make_from_title(self, title: str) -> str:
-        """Extract vehicle make from title."""
-        makes = ['Toyota', 'Honda', 'Nissan', 'Suzuki', 'Mitsubishi', 'Mazda', 
-                 'BMW', 'Mercedes', 'Benz', 'Audi', 'Hyundai', 'KIA']
-        
-        for make in makes:
-            if make.lower() in title.lower():
-                return make
-        return ''
-    
-    def _extract_model_from_title(self, title: str) -> str:
-        """Extract vehicle model from title."""
-        # Remove make and year, return remaining
-        title_clean = title
-        for make in ['Toyota', 'Honda', 'Nissan', 'Suzuki', 'Mitsubishi']:
-            title_clean = title_clean.replace(make, '')
-        title_clean = re.sub(r'\b(19|20)\d{2}\b', '', title_clean)
-        return title_clean.strip()
+            logger.warning("Error extracting Riyasewana vehicle data: %s", e)
+            return None
 
 
 # Test function
@@ -46,15 +46,29 @@ function App() {
                 } else if (data.type === 'typing') {
                     // Typing indicator (optional)
                     setIsLoading(true);
-                } else if (data.type === 'response') {
-                    // Agent response
+                } else if (data.type === 'token') {
+                    // Streamed response text
                     setIsLoading(false);
-                    setMessages(prev => [...prev, {
-                        role: 'assistant',
-                        content: data.message,
-                        vehicles: data.vehicles || [],
-                        comparison: data.comparison || {}
-                    }]);
+                    setMessages(prev => {
+                        const last = prev[prev.length - 1];
+                        if (last && last.streaming) {
+                            return [...prev.slice(0, -1), { ...last, content: last.content + data.delta }];
+                        }
+                        return [...prev, { role: 'assistant', content: data.delta, streaming: true }];
+                    });
+                } else if (data.type === 'response' || data.type === 'done') {
+                    // Complete agent response (replaces any streamed text)
+                    setIsLoading(false);
+                    setMessages(prev => {
+                        const last = prev[prev.length - 1];
+                        const base = last && last.streaming ? prev.slice(0, -1) : prev;
+                        return [...base, {
+                            role: 'assistant',
+                            content: data.message,
+                            vehicles: data.vehicles || [],
+                            comparison: data.comparison || {}
+                        }];
+                    });
                 } else if (data.type === 'error') {
                     setIsLoading(false);
                     setMessages(prev => [...prev, {